@@ -3,11 +3,39 @@
 from telegram.ext import (Application, CommandHandler, CallbackQueryHandler, 
                           MessageHandler, filters)
 from app.core.config import settings
-from app.handlers import common, settings as s, training
+from app.handlers import common, settings as s, training, leaderboard
 from app.keyboards import button_texts # Импортируем наш словарь с текстами
+from app.phrase_store import phrase_store
+from app.database import apply_schema_upgrades
+from app.update_processor import PerChatUpdateProcessor
+from app.rate_limiter import SharedRateLimiter
+from app.reminders import start_reminders, stop_reminders
+from app.progress_archive import start_progress_archive, stop_progress_archive
+
+async def post_init(app: Application):
+    """Выполняется после инициализации бота в режиме polling."""
+    await apply_schema_upgrades()
+    # Загружаем фразы в память, чтобы обработчики не ходили за ними в БД
+    await phrase_store.refresh()
+    start_reminders(app.bot)
+    await start_progress_archive()
+
+async def post_shutdown(app: Application):
+    await stop_reminders()
+    await stop_progress_archive()
 
 # Создаем экземпляр Application
-application = Application.builder().token(settings.TELEGRAM_TOKEN).build()
+# Апдейты разных чатов обрабатываются параллельно, одного чата — по порядку.
+# Ответы и рассылки идут через общий лимит отправки, рассылки — с низким приоритетом.
+application = (
+    Application.builder()
+    .token(settings.TELEGRAM_TOKEN)
+    .concurrent_updates(PerChatUpdateProcessor(settings.UPDATE_CONCURRENCY))
+    .rate_limiter(SharedRateLimiter(settings.TELEGRAM_MAX_PER_SECOND, settings.REMINDER_MAX_PER_SECOND))
+    .post_init(post_init)
+    .post_shutdown(post_shutdown)
+    .build()
+)
 
 # --- ИЗМЕНЕНИЕ: Динамически создаем списки текстов для фильтров ---
 # Собираем все варианты текста для каждой кнопки из всех языков
@@ -17,6 +45,7 @@ direction_texts = [lang['direction'] for lang in button_texts.values()]
 start_texts = [lang['start'] for lang in button_texts.values()]
 profile_texts = [lang['profile'] for lang in button_texts.values()]
 settings_texts = [lang['settings'] for lang in button_texts.values()]
+leaderboard_texts = [lang['leaderboard'] for lang in button_texts.values()]
 
 # Этот сет теперь автоматически включает и узбекские тексты. Он используется
 # чтобы обработчик перевода не срабатывал на нажатие кнопок.
@@ -27,6 +56,7 @@ all_button_texts = {text for lang in button_texts.values() for text in lang.valu
 # Общие команды
 application.add_handler(CommandHandler("start", common.start))
 application.add_handler(CallbackQueryHandler(common.set_language, pattern="^lang_"))
+application.add_handler(CommandHandler("top", leaderboard.show_leaderboard))
 
 # Настройки (реагируем на текстовые сообщения из ReplyKeyboard)
 application.add_handler(MessageHandler(filters.Text(themes_texts), s.show_topics))
@@ -34,11 +64,16 @@ application.add_handler(MessageHandler(filters.Text(level_texts), s.show_levels)
 application.add_handler(MessageHandler(filters.Text(direction_texts), s.show_direction))
 application.add_handler(MessageHandler(filters.Text(profile_texts), common.show_profile))
 application.add_handler(MessageHandler(filters.Text(settings_texts), common.show_settings))
+application.add_handler(MessageHandler(filters.Text(leaderboard_texts), leaderboard.show_leaderboard))
 
 # Обработчики для Inline-кнопок настроек
 application.add_handler(CallbackQueryHandler(s.set_topic, pattern="^topic_"))
 application.add_handler(CallbackQueryHandler(s.set_level, pattern="^level_"))
 application.add_handler(CallbackQueryHandler(s.set_direction, pattern="^dir_"))
+application.add_handler(CallbackQueryHandler(common.toggle_reminders, pattern="^reminders_toggle$"))
+
+# Рейтинг: переключение периода и темы
+application.add_handler(CallbackQueryHandler(leaderboard.switch_leaderboard, pattern="^lb_"))
 
 # Тренировка
 application.add_handler(MessageHandler(filters.Text(start_texts), training.start_training_command))
@@ -10,5 +10,32 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     WEBHOOK_URL: str
 
+    # Как часто (в секундах) хранилище фраз догружает новые строки из БД
+    PHRASE_STORE_REFRESH_SECONDS: int = 300
+
+    # Сколько апдейтов обрабатываем одновременно (внутри одного чата — строго по очереди)
+    UPDATE_CONCURRENCY: int = 32
+
+    # Общий лимит на сообщения бота в одном процессе (у Telegram ~30 сообщений/с на бота).
+    # Если бот запущен в нескольких процессах, лимит нужно поделить между ними.
+    TELEGRAM_MAX_PER_SECOND: float = 30
+
+    # Ежедневные напоминания
+    REMINDERS_ENABLED: bool = True
+    REMINDER_HOUR_UTC: int = 15          # Начало окна рассылки
+    REMINDER_WINDOW_MINUTES: int = 120   # Растягиваем отправку на это окно
+    # Доля общего лимита для рассылки; остаток всегда достается ответам пользователям
+    REMINDER_MAX_PER_SECOND: float = 20
+    REMINDER_BATCH_SIZE: int = 1000
+
+    # Ключ для эндпоинтов выгрузки (заголовок X-API-Key). Если не задан, выгрузка отключена
+    EXPORT_API_KEY: str | None = None
+    # Сколько выгрузок может идти одновременно (у каждой свое соединение с БД)
+    EXPORT_MAX_CONCURRENT: int = 2
+
+    # Сколько последних месяцев user_progress хранится построчно; более старые
+    # месяцы сворачиваются в user_progress_rollup, а их партиции удаляются
+    PROGRESS_RAW_MONTHS: int = 3
+
 # Создаем единственный экземпляр настроек, который будем использовать во всем приложении
 settings = Settings()
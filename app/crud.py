@@ -1,9 +1,12 @@
 # app/crud.py
 
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import select, update, delete, func, literal, union_all, cast, Numeric, true, false
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import selectinload
-from app.models import User, Phrase, Level, Topic, UserProgress
+from app.models import (User, Phrase, Level, Topic, UserProgress, UserProgressRollup,
+                        ReminderCheckpoint, LeaderboardScore)
 
 # --- User Functions ---
 
@@ -53,23 +56,245 @@ async def get_all_levels(session: AsyncSession):
     result = await session.execute(select(Level).order_by(Level.sort_order))
     return result.scalars().all()
 
-async def get_random_phrase(session: AsyncSession, user: User) -> Phrase | None:
-    if not user.topic_id or not user.level_id:
-        return None
-        
+async def get_phrases_after(session: AsyncSession, after_id: int, limit: int):
+    """Возвращает строки фраз с id > after_id (keyset-пагинация для хранилища фраз)."""
     result = await session.execute(
-        select(Phrase)
-        .filter_by(topic_id=user.topic_id, level_id=user.level_id)
-        .order_by(func.random())
-        .limit(1)
+        select(Phrase.id, Phrase.topic_id, Phrase.level_id,
+               Phrase.text_en, Phrase.text_ru, Phrase.text_uz)
+        .where(Phrase.id > after_id)
+        .order_by(Phrase.id)
+        .limit(limit)
     )
-    return result.scalar_one_or_none()
-    
-async def get_phrase_by_id(session: AsyncSession, phrase_id: int) -> Phrase | None:
-    result = await session.execute(select(Phrase).filter_by(id=phrase_id))
-    return result.scalar_one_or_none()
+    return result.all()
+
+def week_key(day: date) -> str:
+    """Ключ ISO-недели для недельных рейтингов, например '2026-W42'."""
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
 
-async def save_user_progress(session: AsyncSession, user_id: int, phrase_id: int, score: int):
+def current_week() -> str:
+    return week_key(datetime.now(timezone.utc).date())
+
+async def save_user_progress(session: AsyncSession, user_id: int, phrase_id: int, topic_id: int, score: int):
+    """
+    Сохраняет попытку и прибавляет баллы к рейтингам (за неделю и за все время,
+    по теме и по всем темам). Возвращает новые суммы: [(period, topic_id, score), ...].
+    """
     progress = UserProgress(user_id=user_id, phrase_id=phrase_id, score=score, attempts=1)
     session.add(progress)
+
+    boards = [(period, topic) for period in ('all', current_week()) for topic in (0, topic_id)]
+    stmt = insert(LeaderboardScore).values([
+        {'period': period, 'topic_id': topic, 'user_id': user_id, 'score': score}
+        for period, topic in boards
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LeaderboardScore.period, LeaderboardScore.topic_id, LeaderboardScore.user_id],
+        set_={'score': LeaderboardScore.score + stmt.excluded.score, 'updated_at': func.now()}
+    ).returning(LeaderboardScore.period, LeaderboardScore.topic_id, LeaderboardScore.score)
+    result = await session.execute(stmt)
+    totals = result.all()
     await session.commit()
+    return totals
+
+# --- Progress History ---
+
+def progress_history():
+    """
+    Вся история ответов в одном виде: сырые попытки из user_progress и старые
+    месяцы, свернутые в user_progress_rollup (см. app/progress_archive.py).
+    Для сырой строки attempts = 1, а score_sum/min_score/max_score/last_score равны ее оценке.
+    """
+    raw = select(
+        UserProgress.user_id, UserProgress.phrase_id, UserProgress.attempts,
+        func.coalesce(UserProgress.score, 0).label('score_sum'),
+        UserProgress.score.label('min_score'), UserProgress.score.label('max_score'),
+        UserProgress.score.label('last_score'),
+        UserProgress.last_attempt, false().label('rolled_up'),
+    )
+    rolled_up = select(
+        UserProgressRollup.user_id, UserProgressRollup.phrase_id, UserProgressRollup.attempts,
+        UserProgressRollup.score_sum, UserProgressRollup.min_score, UserProgressRollup.max_score,
+        UserProgressRollup.last_score, UserProgressRollup.last_attempt, true().label('rolled_up'),
+    )
+    return union_all(raw, rolled_up).subquery('progress_history')
+
+# --- Reminder Functions ---
+
+async def get_reminder_users_batch(session: AsyncSession, after_user_id: int, limit: int,
+                                   active_since: datetime, due_score_threshold: int):
+    """
+    Следующая пачка пользователей с включенными напоминаниями (keyset-пагинация по users.id).
+    Для каждого возвращает, занимался ли он после active_since, и сколько фраз
+    у него на повторении: фразы, последний ответ на которые оценен ниже due_score_threshold.
+    Подзапросы идут по индексу (user_id, last_attempt) в user_progress
+    и по первичному ключу user_progress_rollup.
+    active_since передается с часовым поясом: last_attempt — TIMESTAMP без пояса
+    во времени сессии БД, и сравнение переводит его в этот пояс на стороне Postgres.
+    """
+    # Сегодняшние попытки всегда в сырых данных, свертка их не трогает
+    practiced = (
+        select(UserProgress.id)
+        .where(UserProgress.user_id == User.id, UserProgress.last_attempt >= active_since)
+        .exists()
+    )
+    history = progress_history()
+    latest = (
+        select(history.c.last_score)
+        .where(history.c.user_id == User.id)
+        .distinct(history.c.phrase_id)
+        .order_by(history.c.phrase_id, history.c.last_attempt.desc())
+        .correlate(User)
+        .subquery('latest')
+    )
+    due_phrases = (
+        select(func.count())
+        .select_from(latest)
+        .where(latest.c.last_score < due_score_threshold)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        select(User.id, User.tg_id, User.language,
+               practiced.label('practiced'), due_phrases.label('due_phrases'))
+        .where(User.id > after_user_id, User.reminders_enabled.is_(True))
+        .order_by(User.id)
+        .limit(limit)
+    )
+    return result.all()
+
+async def count_reminder_users(session: AsyncSession, after_user_id: int) -> int:
+    result = await session.execute(
+        select(func.count(User.id))
+        .where(User.id > after_user_id, User.reminders_enabled.is_(True))
+    )
+    return result.scalar_one()
+
+async def disable_reminders(session: AsyncSession, user_ids: list[int]):
+    """Отключает напоминания (например, для тех, кто заблокировал бота)."""
+    if not user_ids:
+        return
+    await session.execute(
+        update(User).where(User.id.in_(user_ids)).values(reminders_enabled=False)
+    )
+    await session.commit()
+
+async def get_reminder_checkpoint(session: AsyncSession, run_date: date) -> ReminderCheckpoint:
+    checkpoint = await session.get(ReminderCheckpoint, run_date)
+    if not checkpoint:
+        checkpoint = ReminderCheckpoint(run_date=run_date, last_user_id=0, sent=0)
+        session.add(checkpoint)
+        await session.commit()
+    return checkpoint
+
+async def save_reminder_checkpoint(session: AsyncSession, run_date: date, last_user_id: int,
+                                   sent: int, finished: bool = False):
+    values = {'last_user_id': last_user_id, 'sent': sent}
+    if finished:
+        values['finished_at'] = func.now()
+    await session.execute(
+        update(ReminderCheckpoint).where(ReminderCheckpoint.run_date == run_date).values(**values)
+    )
+    await session.commit()
+
+# --- Leaderboard Functions ---
+
+async def get_leaderboard_scores(session: AsyncSession, period: str, topic_id: int):
+    """Все суммы одного рейтинга: [(user_id, score), ...]."""
+    result = await session.execute(
+        select(LeaderboardScore.user_id, LeaderboardScore.score)
+        .filter_by(period=period, topic_id=topic_id)
+    )
+    return result.all()
+
+async def get_leaderboard_changes(session: AsyncSession, period: str, topic_id: int, since: datetime):
+    """Суммы рейтинга, изменившиеся после since: [(user_id, score), ...]."""
+    result = await session.execute(
+        select(LeaderboardScore.user_id, LeaderboardScore.score)
+        .filter_by(period=period, topic_id=topic_id)
+        .where(LeaderboardScore.updated_at > since)
+    )
+    return result.all()
+
+async def delete_weekly_scores_before(session: AsyncSession, oldest_kept_week: str) -> int:
+    """Удаляет недельные рейтинги раньше oldest_kept_week. Возвращает число удаленных строк."""
+    # Ключи 'YYYY-Www' сравниваются как строки в хронологическом порядке
+    result = await session.execute(
+        delete(LeaderboardScore)
+        .where(LeaderboardScore.period != 'all', LeaderboardScore.period < oldest_kept_week)
+    )
+    await session.commit()
+    return result.rowcount
+
+async def get_db_now(session: AsyncSession) -> datetime:
+    """Текущее время сервера БД (в нем же пишется leaderboard_scores.updated_at)."""
+    return await session.scalar(select(func.localtimestamp()))
+
+def leaderboard_seed_query():
+    """
+    Начальные суммы рейтингов из уже накопленной истории ответов: за все время
+    и за текущую неделю, по темам и по всем темам.
+    """
+    history = progress_history()
+    today = datetime.now(timezone.utc).date()
+    # Начало UTC-недели с часовым поясом: Postgres переведет его во время сессии,
+    # в котором хранится last_attempt (как и в get_reminder_users_batch)
+    week_start = datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time(),
+                                  tzinfo=timezone.utc)
+    score = func.sum(history.c.score_sum)
+
+    boards = []
+    for period, since in (('all', None), (week_key(today), week_start)):
+        overall = select(literal(period), literal(0), history.c.user_id, score).group_by(history.c.user_id)
+        by_topic = (
+            select(literal(period), Phrase.topic_id, history.c.user_id, score)
+            .join(Phrase, Phrase.id == history.c.phrase_id)
+            .group_by(Phrase.topic_id, history.c.user_id)
+        )
+        if since is not None:
+            overall = overall.where(history.c.last_attempt >= since)
+            by_topic = by_topic.where(history.c.last_attempt >= since)
+        boards += [overall, by_topic]
+    return insert(LeaderboardScore).from_select(
+        ['period', 'topic_id', 'user_id', 'score'], union_all(*boards)
+    )
+
+async def get_users_by_ids(session: AsyncSession, user_ids: list[int]) -> dict[int, User]:
+    result = await session.execute(select(User).where(User.id.in_(user_ids)))
+    return {user.id: user for user in result.scalars()}
+
+# --- Export Functions ---
+
+async def stream_progress(conn: AsyncConnection, batch_size: int = 1000):
+    """
+    Построчно отдает историю прогресса (сырые попытки и свернутые месяцы)
+    через серверный курсор (в памяти только одна пачка). Без сортировки,
+    чтобы Postgres не сортировал всю историю перед первой строкой.
+    """
+    history = progress_history()
+    result = await conn.stream(
+        select(history.c.user_id, history.c.phrase_id, Phrase.topic_id, Phrase.level_id,
+               history.c.attempts, history.c.score_sum, history.c.min_score,
+               history.c.max_score, history.c.last_score, history.c.last_attempt,
+               history.c.rolled_up)
+        .join(Phrase, Phrase.id == history.c.phrase_id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for row in result:
+        yield row
+
+async def stream_phrase_stats(conn: AsyncConnection, batch_size: int = 1000):
+    """Средняя оценка и число попыток по каждой фразе, с темой и уровнем."""
+    history = progress_history()
+    attempts = func.sum(history.c.attempts)
+    result = await conn.stream(
+        select(Phrase.id.label('phrase_id'), Phrase.topic_id, Phrase.level_id,
+               attempts.label('attempts'),
+               func.round(cast(func.sum(history.c.score_sum), Numeric) / func.nullif(attempts, 0), 2)
+               .label('avg_score'))
+        .join(history, history.c.phrase_id == Phrase.id)
+        .group_by(Phrase.id)
+        .order_by(Phrase.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for row in result:
+        yield row
@@ -1,7 +1,13 @@
 # app/database.py (УЛУЧШЕННАЯ ВЕРСИЯ)
+import logging
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy import event
+from sqlalchemy import event, func, select, text
+from sqlalchemy.pool import NullPool
+from app import crud
 from app.core.config import settings
+from app.models import Base, UserProgress, add_months, partition_name
+
+logger = logging.getLogger(__name__)
 
 # Создаем асинхронный "движок"
 # pool_size=5, max_overflow=10 - стандартные настройки для небольшого веб-приложения
@@ -25,9 +31,87 @@ def close(dbapi_connection, connection_record):
     """Выполняется при закрытии соединения."""
     pass
 
+# Отдельный движок для выгрузок и фонового обслуживания: без пула, каждое соединение
+# открывается под задачу и закрывается после нее. Долгие задачи не занимают соединения бота.
+export_engine = create_async_engine(settings.DATABASE_URL, echo=False, poolclass=NullPool)
+
 # Создаем фабрику сессий
 async_session_factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+# create_all не добавляет новые колонки в уже существующие таблицы,
+# поэтому такие изменения схемы применяем отдельно (идемпотентно)
+SCHEMA_UPGRADES = [
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS reminders_enabled BOOLEAN NOT NULL DEFAULT true",
+]
+# Ключ advisory-блокировки: обновления схемы из нескольких процессов идут по очереди
+SCHEMA_LOCK_KEY = 726003
+
+# Время попытки для старых строк без last_attempt (ключ партиции не может быть NULL)
+LEGACY_LAST_ATTEMPT = (
+    "coalesce(last_attempt, (SELECT min(last_attempt) FROM user_progress_legacy), localtimestamp)"
+)
+
+async def partition_user_progress(conn):
+    """
+    Переводит user_progress, созданную до партиционирования, на месячные партиции.
+    Старая таблица переименовывается, создается партиционированная, строки
+    копируются в партиции своих месяцев (id сохраняются, последовательность
+    продолжается с max(id)), старая таблица удаляется. Уже партиционированную
+    таблицу не трогает. Выполняется в транзакции apply_schema_upgrades.
+    """
+    relkind = await conn.scalar(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass('user_progress')"
+    ))
+    if relkind != 'r':
+        return
+    logger.info("Converting user_progress to a partitioned table...")
+
+    # Освобождаем имена, которые займет новая таблица
+    await conn.execute(text("ALTER TABLE user_progress RENAME TO user_progress_legacy"))
+    await conn.execute(text(
+        "ALTER TABLE user_progress_legacy RENAME CONSTRAINT user_progress_pkey TO user_progress_legacy_pkey"
+    ))
+    await conn.execute(text("ALTER SEQUENCE IF EXISTS user_progress_id_seq RENAME TO user_progress_legacy_id_seq"))
+    await conn.run_sync(UserProgress.__table__.create)
+
+    # Партиции для всех месяцев со строками и для текущего месяца
+    months = (await conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', {LEGACY_LAST_ATTEMPT})::date FROM user_progress_legacy "
+        f"UNION SELECT date_trunc('month', localtimestamp)::date"
+    ))).scalars().all()
+    for month in months:
+        await conn.execute(text(
+            f"CREATE TABLE {partition_name(month)} PARTITION OF user_progress "
+            f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+        ))
+
+    result = await conn.execute(text(
+        f"INSERT INTO user_progress (id, user_id, phrase_id, score, attempts, last_attempt) "
+        f"SELECT id, user_id, phrase_id, score, attempts, {LEGACY_LAST_ATTEMPT} FROM user_progress_legacy"
+    ))
+    await conn.execute(text(
+        "SELECT setval(pg_get_serial_sequence('user_progress', 'id'), "
+        "coalesce((SELECT max(id) FROM user_progress_legacy), 0) + 1, false)"
+    ))
+    await conn.execute(text("DROP TABLE user_progress_legacy"))
+    logger.info(f"user_progress converted: {result.rowcount} rows in {len(months)} monthly partitions")
+
+async def apply_schema_upgrades():
+    """
+    Создает недостающие таблицы, переводит старую user_progress на партиции,
+    заполняет новые рейтинги и применяет SCHEMA_UPGRADES.
+    """
+    async with engine.begin() as conn:
+        await conn.execute(select(func.pg_advisory_xact_lock(SCHEMA_LOCK_KEY)))
+        await partition_user_progress(conn)
+        had_leaderboards = await conn.scalar(select(func.to_regclass('leaderboard_scores')))
+        await conn.run_sync(Base.metadata.create_all)
+        if not had_leaderboards:
+            # Таблица рейтингов появилась позже истории ответов: переносим в нее уже набранные баллы
+            await conn.execute(crud.leaderboard_seed_query())
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
+
 # Зависимость для FastAPI (не используется в боте напрямую, но полезна)
 async def get_db_session():
     async with async_session_factory() as session:
@@ -5,12 +5,13 @@ import json
 import logging
 from google.api_core import exceptions as google_exceptions
 from app.core.config import settings
-from app.models import Phrase, User # <-- Импортируем User
+from app.models import User # <-- Импортируем User
+from app.phrase_store import CachedPhrase
 
 genai.configure(api_key=settings.GEMINI_API_KEY)
 model = genai.GenerativeModel('gemini-2.5-flash')
 
-async def check_user_translation(original_phrase: Phrase, user_translation: str, user: User) -> dict:
+async def check_user_translation(original_phrase: CachedPhrase, user_translation: str, user: User) -> dict:
     """
     Обращается к Gemini API для оценки перевода пользователя на его языке.
     """
@@ -80,5 +80,25 @@ async def show_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Не удалось найти ваш профиль. Попробуйте нажать /start.")
 
 async def show_settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = "Здесь будут настройки. Например, уведомления или смена языка. Эта функция пока в разработке."
-    await update.message.reply_text(text)
+    async with async_session_factory() as session:
+        user = await crud.get_or_create_user(session, update.effective_user.id, update.effective_user.username)
+
+    text = "⚙️ Настройки\n\nЕжедневное напоминание о тренировке можно включить или выключить кнопкой ниже."
+    await update.message.reply_text(
+        text,
+        reply_markup=keyboards.settings_keyboard(user.reminders_enabled, user.language)
+    )
+
+async def toggle_reminders(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    async with async_session_factory() as session:
+        user = await crud.get_or_create_user(session, query.from_user.id)
+        user = await crud.update_user_setting(
+            session, tg_id=query.from_user.id, reminders_enabled=not user.reminders_enabled
+        )
+
+    await query.edit_message_reply_markup(
+        reply_markup=keyboards.settings_keyboard(user.reminders_enabled, user.language)
+    )
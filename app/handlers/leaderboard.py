@@ -0,0 +1,61 @@
+# app/handlers/leaderboard.py
+
+from telegram import Update
+from telegram.ext import ContextTypes
+from app import crud, keyboards
+from app.database import async_session_factory
+from app.leaderboard import leaderboards
+
+TOP_SIZE = 10
+
+async def build_leaderboard(user, period: str, topic_id: int) -> str:
+    """Текст рейтинга: top-N и место текущего пользователя."""
+    board_period = crud.current_week() if period == 'week' else 'all'
+    ranking = await leaderboards.get(board_period, topic_id)
+    top = ranking.top(TOP_SIZE)
+
+    async with async_session_factory() as session:
+        users = await crud.get_users_by_ids(session, [user_id for user_id, _ in top])
+
+    title = "🏆 Рейтинг за неделю" if period == 'week' else "🏆 Рейтинг за все время"
+    if topic_id and user.topic and user.topic.id == topic_id:
+        title += f" — {getattr(user.topic, f'name_{user.language}', user.topic.name_ru)}"
+
+    lines = [title, ""]
+    if not top:
+        lines.append("Пока никто не набрал баллов. Будьте первым!")
+    for place, (user_id, score) in enumerate(top, start=1):
+        member = users.get(user_id)
+        name = f"@{member.username}" if member and member.username else f"Ученик #{user_id}"
+        lines.append(f"{place}. {name} — {score}")
+
+    my_rank = ranking.rank(user.id)
+    if my_rank:
+        place, score = my_rank
+        lines.append(f"\nВаше место: {place} из {len(ranking)} ({score} баллов)")
+    return "\n".join(lines)
+
+async def show_leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async with async_session_factory() as session:
+        user = await crud.get_or_create_user(session, update.effective_user.id, update.effective_user.username)
+
+    text = await build_leaderboard(user, 'week', 0)
+    await update.effective_message.reply_text(
+        text,
+        reply_markup=keyboards.leaderboard_keyboard('week', 0, user.topic_id, user.language)
+    )
+
+async def switch_leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    _, period, topic_id = query.data.split('_')
+    topic_id = int(topic_id)
+
+    async with async_session_factory() as session:
+        user = await crud.get_or_create_user(session, query.from_user.id)
+
+    text = await build_leaderboard(user, period, topic_id)
+    await query.edit_message_text(
+        text,
+        reply_markup=keyboards.leaderboard_keyboard(period, topic_id, user.topic_id, user.language)
+    )
@@ -9,6 +9,8 @@ from google.api_core import exceptions as google_exceptions
 
 from app import crud, keyboards, gemini
 from app.database import async_session_factory
+from app.phrase_store import phrase_store
+from app.leaderboard import leaderboards
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +28,7 @@ async def start_training_logic(context: ContextTypes.DEFAULT_TYPE, chat_id: int,
             await context.bot.send_message(chat_id=chat_id, text="❗️ Пожалуйста, сначала выберите все настройки в меню.")
             return
 
-        phrase = await crud.get_random_phrase(session, user)
+        phrase = await phrase_store.get_random(user.topic_id, user.level_id)
 
         if not phrase:
             await context.bot.send_message(chat_id=chat_id, text="😕 Не найдено фраз для ваших настроек.")
@@ -58,7 +60,8 @@ async def check_translation(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("Чтобы начать, нажмите '▶ Начать тренировку' в меню.")
             return
         
-        original_phrase = await crud.get_phrase_by_id(session, user.current_phrase_id)
+        # Текст фразы читаем из памяти, без запроса к БД
+        original_phrase = await phrase_store.get(user.current_phrase_id)
         if not original_phrase:
             await update.message.reply_text("Произошла ошибка, не могу найти исходную фразу. Начнем заново.")
             await crud.update_user_state(session, user_id, None, None)
@@ -74,7 +77,10 @@ async def check_translation(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         
         async with async_session_factory() as session:
-            await crud.save_user_progress(session, user.id, original_phrase.id, ai_feedback.get('score', 0))
+            totals = await crud.save_user_progress(
+                session, user.id, original_phrase.id, original_phrase.topic_id, ai_feedback.get('score', 0)
+            )
+        leaderboards.apply(user.id, totals)
 
         score = ai_feedback.get('score', 0)
         correct_translation = escape_markdown(ai_feedback.get('correct_translation', 'N/A'), version=2)
@@ -8,17 +8,26 @@ button_texts = {
     'ru': {
         'themes': '📚 Темы', 'level': '📈 Уровень', 'direction': '🔁 Направление',
         'start': '▶ Начать тренировку', 'profile': '👤 Профиль', 'settings': '⚙️ Настройки',
-        'next_phrase': '▶️ Следующая фраза', 'change_topic': '📚 Сменить тему', 'change_level': '📈 Сменить уровень'
+        'leaderboard': '🏆 Рейтинг',
+        'next_phrase': '▶️ Следующая фраза', 'change_topic': '📚 Сменить тему', 'change_level': '📈 Сменить уровень',
+        'reminders_on': '🔔 Напоминания: вкл', 'reminders_off': '🔕 Напоминания: выкл',
+        'lb_week': '📅 Неделя', 'lb_all': '♾ Все время', 'lb_my_topic': '📚 Моя тема', 'lb_all_topics': '🌐 Все темы'
     },
     'en': {
         'themes': '📚 Topics', 'level': '📈 Level', 'direction': '🔁 Direction',
         'start': '▶ Start Training', 'profile': '👤 Profile', 'settings': '⚙️ Settings',
-        'next_phrase': '▶️ Next Phrase', 'change_topic': '📚 Change Topic', 'change_level': '📈 Change Level'
+        'leaderboard': '🏆 Leaderboard',
+        'next_phrase': '▶️ Next Phrase', 'change_topic': '📚 Change Topic', 'change_level': '📈 Change Level',
+        'reminders_on': '🔔 Reminders: on', 'reminders_off': '🔕 Reminders: off',
+        'lb_week': '📅 Week', 'lb_all': '♾ All time', 'lb_my_topic': '📚 My topic', 'lb_all_topics': '🌐 All topics'
     },
     'uz': {
         'themes': '📚 Mavzular', 'level': '📈 Daraja', 'direction': '🔁 Yo‘nalish',
         'start': '▶ Mashg‘ulotni boshlash', 'profile': '👤 Profil', 'settings': '⚙️ Sozlamalar',
-        'next_phrase': '▶️ Keyingi ibora', 'change_topic': '📚 Mavzuni o‘zgartirish', 'change_level': '📈 Darajani o‘zgartirish'
+        'leaderboard': '🏆 Reyting',
+        'next_phrase': '▶️ Keyingi ibora', 'change_topic': '📚 Mavzuni o‘zgartirish', 'change_level': '📈 Darajani o‘zgartirish',
+        'reminders_on': '🔔 Eslatmalar: yoqilgan', 'reminders_off': '🔕 Eslatmalar: o‘chirilgan',
+        'lb_week': '📅 Hafta', 'lb_all': '♾ Butun vaqt', 'lb_my_topic': '📚 Mening mavzuim', 'lb_all_topics': '🌐 Barcha mavzular'
     }
 }
 
@@ -39,7 +48,7 @@ def main_menu_keyboard(lang: str = 'ru') -> ReplyKeyboardMarkup:
     keyboard = [
         [texts['themes'], texts['level'], texts['direction']],
         [texts['start']],
-        [texts['profile'], texts['settings']]
+        [texts['profile'], texts['leaderboard'], texts['settings']]
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
@@ -66,6 +75,24 @@ def direction_keyboard() -> InlineKeyboardMarkup:
         [InlineKeyboardButton("🇬🇧 Английский → 🇺🇿 O‘zbek", callback_data='dir_en-uz')],
     ]
     return InlineKeyboardMarkup(keyboard)
+
+def settings_keyboard(reminders_enabled: bool, lang: str = 'ru') -> InlineKeyboardMarkup:
+    """Клавиатура настроек: переключатель ежедневных напоминаний."""
+    texts = button_texts.get(lang, button_texts['ru'])
+    text = texts['reminders_on'] if reminders_enabled else texts['reminders_off']
+    keyboard = [[InlineKeyboardButton(text, callback_data='reminders_toggle')]]
+    return InlineKeyboardMarkup(keyboard)
+
+def leaderboard_keyboard(period: str, topic_id: int, user_topic_id: int | None, lang: str = 'ru') -> InlineKeyboardMarkup:
+    """Переключатели рейтинга: период (неделя/все время) и тема (моя/все)."""
+    texts = button_texts.get(lang, button_texts['ru'])
+    other_period = 'all' if period == 'week' else 'week'
+    keyboard = [[InlineKeyboardButton(texts[f'lb_{other_period}'], callback_data=f'lb_{other_period}_{topic_id}')]]
+    if topic_id:
+        keyboard[0].append(InlineKeyboardButton(texts['lb_all_topics'], callback_data=f'lb_{period}_0'))
+    elif user_topic_id:
+        keyboard[0].append(InlineKeyboardButton(texts['lb_my_topic'], callback_data=f'lb_{period}_{user_topic_id}'))
+    return InlineKeyboardMarkup(keyboard)
     
 def after_training_keyboard(lang: str = 'ru') -> InlineKeyboardMarkup:
     """Клавиатура, появляющаяся после проверки перевода."""
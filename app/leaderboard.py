@@ -0,0 +1,139 @@
+# app/leaderboard.py
+
+import asyncio
+import logging
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+
+from app import crud
+from app.database import async_session_factory
+
+logger = logging.getLogger(__name__)
+
+# Как часто (в секундах) подтягиваем из leaderboard_scores баллы, набранные через
+# другие процессы. Между синхронизациями рейтинг обновляется после каждого ответа.
+RELOAD_SECONDS = 60
+# updated_at — время начала транзакции, а видна строка только после коммита,
+# поэтому при синхронизации захватываем и немного более ранние изменения
+SYNC_OVERLAP = timedelta(seconds=30)
+# Сколько недельных рейтингов (включая текущий) хранится в leaderboard_scores
+WEEKS_KEPT = 2
+
+
+class Ranking:
+    """
+    Один рейтинг в памяти: отсортированный список ключей (-score, user_id).
+    Место пользователя и top-N ищутся бинарным поиском за O(log n).
+    """
+
+    def __init__(self, scores=()):
+        self._scores: dict[int, int] = dict(scores)
+        self._keys: list[tuple[int, int]] = sorted((-score, user_id) for user_id, score in self._scores.items())
+        # Время БД, до которого изменения из leaderboard_scores уже учтены
+        self.synced_at = None
+        self.checked_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def set(self, user_id: int, score: int):
+        """Суммы только растут, поэтому меньшее (устаревшее) значение игнорируется."""
+        old = self._scores.get(user_id)
+        if old is not None and old >= score:
+            return
+        if old is not None:
+            index = bisect_left(self._keys, (-old, user_id))
+            del self._keys[index]
+        self._scores[user_id] = score
+        insort(self._keys, (-score, user_id))
+
+    def top(self, limit: int) -> list[tuple[int, int]]:
+        """[(user_id, score), ...] по убыванию баллов."""
+        return [(user_id, -neg_score) for neg_score, user_id in self._keys[:limit]]
+
+    def rank(self, user_id: int) -> tuple[int, int] | None:
+        """(место, баллы) пользователя или None, если в рейтинге его нет."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect_left(self._keys, (-score, user_id)) + 1, score
+
+
+class LeaderboardStore:
+    """
+    Рейтинги по ключу (period, topic_id). Полностью загружаются при первом обращении,
+    дальше раз в RELOAD_SECONDS подтягиваются только строки, изменившиеся с прошлого раза.
+    """
+
+    def __init__(self):
+        self._boards: dict[tuple[str, int], Ranking] = {}
+        self._syncing: set[tuple[str, int]] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def _load(self, board: tuple[str, int]) -> Ranking:
+        async with async_session_factory() as session:
+            synced_at = await crud.get_db_now(session)
+            scores = await crud.get_leaderboard_scores(session, *board)
+        # Сортировка сотен тысяч строк заняла бы цикл событий, поэтому строим в потоке
+        ranking = await asyncio.to_thread(Ranking, scores)
+        ranking.synced_at = synced_at
+        return ranking
+
+    async def _sync(self, board: tuple[str, int], ranking: Ranking):
+        try:
+            async with async_session_factory() as session:
+                synced_at = await crud.get_db_now(session)
+                changes = await crud.get_leaderboard_changes(
+                    session, *board, ranking.synced_at - SYNC_OVERLAP
+                )
+            for user_id, score in changes:
+                ranking.set(user_id, score)
+            ranking.synced_at = synced_at
+        except Exception as e:
+            logger.error(f"Failed to sync leaderboard {board}: {e}", exc_info=True)
+        finally:
+            ranking.checked_at = time.monotonic()
+            self._syncing.discard(board)
+
+    def _drop_old_weeks(self):
+        week = crud.current_week()
+        for board in list(self._boards):
+            if board[0] not in ('all', week):
+                del self._boards[board]
+
+    async def get(self, period: str, topic_id: int) -> Ranking:
+        board = (period, topic_id)
+        ranking = self._boards.get(board)
+        if ranking is None:
+            self._drop_old_weeks()
+            ranking = self._boards[board] = await self._load(board)
+        elif time.monotonic() - ranking.checked_at > RELOAD_SECONDS and board not in self._syncing:
+            # Синхронизируем в фоне, а пока отвечаем по текущим данным
+            self._syncing.add(board)
+            task = asyncio.create_task(self._sync(board, ranking))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return ranking
+
+    def apply(self, user_id: int, totals):
+        """Применяет суммы, которые вернул crud.save_user_progress, к загруженным рейтингам."""
+        for period, topic_id, score in totals:
+            ranking = self._boards.get((period, topic_id))
+            if ranking is not None:
+                ranking.set(user_id, score)
+
+
+async def prune_weekly_scores() -> int:
+    """Удаляет из leaderboard_scores недельные рейтинги старше WEEKS_KEPT недель."""
+    today = datetime.now(timezone.utc).date()
+    oldest_kept = crud.week_key(today - timedelta(weeks=WEEKS_KEPT - 1))
+    async with async_session_factory() as session:
+        deleted = await crud.delete_weekly_scores_before(session, oldest_kept)
+    if deleted:
+        logger.info(f"Deleted {deleted} weekly leaderboard rows older than {oldest_kept}")
+    return deleted
+
+
+# Единственный экземпляр рейтингов для всего приложения
+leaderboards = LeaderboardStore()
@@ -2,14 +2,25 @@
 
 import logging
 import asyncio
-from fastapi import FastAPI, Request, Response
+import csv
+import io
+import json
+import secrets
+from datetime import datetime
+from decimal import Decimal
+from typing import Literal
+from fastapi import FastAPI, Request, Response, Header, Query
+from fastapi.responses import StreamingResponse
 from telegram import Update
 import uvicorn
 
 from app.bot import application
 from app.core.config import settings
-from app.database import engine  # ### ДОБАВЛЕНО: Импортируем engine
-from app.models import Base  # ### ДОБАВЛЕНО: Импортируем Base со всеми моделями
+from app import crud
+from app.database import export_engine, apply_schema_upgrades
+from app.phrase_store import phrase_store
+from app.reminders import start_reminders, stop_reminders
+from app.progress_archive import start_progress_archive, stop_progress_archive
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
@@ -18,27 +29,99 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(docs_url=None, redoc_url=None)
 
-### ДОБАВЛЕНО: Функция для создания таблиц ###
-def create_tables():
-    logger.info("Creating database tables if they don't exist...")
-    try:
-        # create_all не является асинхронной, поэтому используем sync_engine
-        Base.metadata.create_all(bind=engine.sync_engine)
-        logger.info("Tables created successfully.")
-    except Exception as e:
-        logger.error(f"Error creating tables: {e}", exc_info=True)
-
 @app.get("/")
 async def health_check():
     return Response(status_code=200)
 
 @app.on_event("startup")
 async def on_startup():
-    # ### ДОБАВЛЕНО: Вызываем создание таблиц перед инициализацией бота ###
-    create_tables() 
+    # Создаем недостающие таблицы (и заполняем новые рейтинги) перед инициализацией бота
+    await apply_schema_upgrades()
+    # post_init вызывается только в run_polling/run_webhook, поэтому грузим фразы сами
+    await phrase_store.refresh()
     await application.initialize()
+    # start() запускает разбор update_queue через PerChatUpdateProcessor —
+    # так вебхук обрабатывает апдейты так же, как polling: параллельно, но по порядку в чате
+    await application.start()
+    start_reminders(application.bot)
+    await start_progress_archive()
     logger.info("Application initialized.")
 
+# --- Выгрузки для аналитики ---
+
+# Сколько строк собираем в один кусок ответа
+EXPORT_CHUNK_ROWS = 1000
+
+# export_engine без пула, поэтому число одновременных выгрузок (и их соединений
+# с Postgres) ограничиваем сами, чтобы не выбрать max_connections у бота
+export_slots = asyncio.Semaphore(settings.EXPORT_MAX_CONCURRENT)
+
+async def export_rows(stream_rows, export_format: str):
+    """
+    Превращает поток строк из БД в CSV или NDJSON.
+    Соединение берется из export_engine (без пула), а строки идут через серверный
+    курсор, поэтому память не растет с размером выгрузки.
+    """
+    async with export_slots, export_engine.connect() as conn:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        header_written = False
+        rows_in_chunk = 0
+        async for row in stream_rows(conn):
+            data = row._asdict()
+            if export_format == 'csv':
+                if not header_written:
+                    writer.writerow(data.keys())
+                    header_written = True
+                writer.writerow(data.values())
+            else:
+                buffer.write(json.dumps(data, default=_json_default, ensure_ascii=False) + "\n")
+            rows_in_chunk += 1
+            if rows_in_chunk >= EXPORT_CHUNK_ROWS:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                rows_in_chunk = 0
+        if buffer.tell():
+            yield buffer.getvalue()
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def export_response(stream_rows, export_format: str, name: str, api_key: str | None) -> Response:
+    if not settings.EXPORT_API_KEY or not api_key or not secrets.compare_digest(
+        api_key.encode(), settings.EXPORT_API_KEY.encode()
+    ):
+        return Response(status_code=403)
+    if export_slots.locked():
+        # Все слоты заняты: просим повторить позже, а не копим ожидающие соединения
+        return Response(status_code=429, headers={"Retry-After": "60"})
+    media_type = "text/csv" if export_format == 'csv' else "application/x-ndjson"
+    extension = "csv" if export_format == 'csv' else "ndjson"
+    return StreamingResponse(
+        export_rows(stream_rows, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'}
+    )
+
+@app.get("/export/progress")
+async def export_progress(
+    format: Literal['csv', 'ndjson'] = Query('csv'),
+    x_api_key: str | None = Header(None),
+):
+    return export_response(crud.stream_progress, format, "user_progress", x_api_key)
+
+@app.get("/export/phrase-stats")
+async def export_phrase_stats(
+    format: Literal['csv', 'ndjson'] = Query('csv'),
+    x_api_key: str | None = Header(None),
+):
+    return export_response(crud.stream_phrase_stats, format, "phrase_stats", x_api_key)
+
 @app.post("/{token}")
 async def process_update(token: str, request: Request):
     if token != settings.TELEGRAM_TOKEN:
@@ -48,8 +131,10 @@ async def process_update(token: str, request: Request):
         update_data = await request.json()
         update = Update.de_json(data=update_data, bot=application.bot)
         chat_id = update.effective_chat.id if update.effective_chat else "N/A"
-        logger.info(f"Processing update {update.update_id} from chat {chat_id}")
-        await application.process_update(update)
+        logger.info(f"Queueing update {update.update_id} from chat {chat_id}")
+        # Не ждем обработки: Telegram сразу получает 200, а медленный ответ Gemini
+        # одному пользователю не задерживает остальных
+        await application.update_queue.put(update)
     except Exception as e:
         logger.error(f"Error processing update: {e}", exc_info=True)
     return Response(status_code=200)
@@ -57,6 +142,9 @@ async def process_update(token: str, request: Request):
 @app.on_event("shutdown")
 async def on_shutdown():
     logger.info("Application is shutting down.")
+    await stop_reminders()
+    await stop_progress_archive()
+    await application.stop()
     await application.shutdown()
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 # app/models.py
+from datetime import date
 from sqlalchemy import (Column, Integer, String, BigInteger, ForeignKey,
-                        DateTime, func)
+                        DateTime, Date, Boolean, Index, func, true)
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
@@ -19,6 +20,9 @@ class User(Base):
     state = Column(String(50), nullable=True)
     current_phrase_id = Column(Integer, nullable=True)
 
+    # Ежедневные напоминания о тренировке
+    reminders_enabled = Column(Boolean, nullable=False, default=True, server_default=true())
+
     level = relationship("Level")
     topic = relationship("Topic")
     
@@ -64,13 +68,76 @@ class Phrase(Base):
         return f"<Phrase(id={self.id}, text_en='{self.text_en[:20]}...')>"
 
 class UserProgress(Base):
+    """
+    Сырые попытки, по строке на ответ. Таблица разбита на месячные партиции
+    по last_attempt (см. app/progress_archive.py), поэтому ключ партиции
+    входит в первичный ключ.
+    """
     __tablename__ = 'user_progress'
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     phrase_id = Column(Integer, ForeignKey('phrases.id'), nullable=False)
     score = Column(Integer)
     attempts = Column(Integer, default=0)
-    last_attempt = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    last_attempt = Column(DateTime, primary_key=True, nullable=False, server_default=func.now())
 
     user = relationship("User")
     phrase = relationship("Phrase")
+
+    __table_args__ = (
+        # Для выборок "когда пользователь последний раз занимался" (напоминания)
+        Index('ix_user_progress_user_last_attempt', 'user_id', 'last_attempt'),
+        {'postgresql_partition_by': 'RANGE (last_attempt)'},
+    )
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    """Имя месячной партиции user_progress, например user_progress_y2026m10."""
+    return f"user_progress_y{month.year}m{month.month:02d}"
+
+class UserProgressRollup(Base):
+    """Свертка старых попыток: одна строка на (пользователь, фраза, месяц)."""
+    __tablename__ = 'user_progress_rollup'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    phrase_id = Column(Integer, ForeignKey('phrases.id'), primary_key=True)
+    month = Column(Date, primary_key=True)
+    attempts = Column(Integer, nullable=False)
+    score_sum = Column(BigInteger, nullable=False)
+    min_score = Column(Integer)
+    max_score = Column(Integer)
+    last_score = Column(Integer)  # Оценка последней попытки за месяц
+    last_attempt = Column(DateTime, nullable=False)
+
+class ReminderCheckpoint(Base):
+    """Прогресс рассылки напоминаний за день, чтобы после рестарта продолжить, а не слать заново."""
+    __tablename__ = 'reminder_checkpoints'
+    run_date = Column(Date, primary_key=True)
+    last_user_id = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ReminderCheckpoint(run_date={self.run_date}, last_user_id={self.last_user_id})>"
+
+class LeaderboardScore(Base):
+    """
+    Накопленная сумма баллов пользователя для одного рейтинга.
+    period — 'all' или ISO-неделя ('2026-W42'), topic_id = 0 — все темы.
+    """
+    __tablename__ = 'leaderboard_scores'
+    period = Column(String(10), primary_key=True)
+    topic_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    score = Column(BigInteger, nullable=False, default=0)
+    # Для инкрементальной перезагрузки рейтингов в памяти
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_leaderboard_scores_board_updated', 'period', 'topic_id', 'updated_at'),
+    )
+
+    def __repr__(self):
+        return f"<LeaderboardScore(period='{self.period}', topic_id={self.topic_id}, user_id={self.user_id})>"
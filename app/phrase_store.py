@@ -0,0 +1,170 @@
+# app/phrase_store.py
+
+import asyncio
+import logging
+import random
+import sys
+import time
+from array import array
+from typing import NamedTuple
+
+from app import crud
+from app.core.config import settings
+from app.database import async_session_factory
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк забираем из БД за один запрос при догрузке
+LOAD_BATCH_SIZE = 5000
+# Если прошлая догрузка ничего не нашла, запрос неизвестного id (например, удаленной
+# фразы) снова идет в БД не чаще, чем раз в столько секунд
+MISS_REFRESH_SECONDS = 5
+
+
+class CachedPhrase(NamedTuple):
+    """Фраза из памяти. Повторяет поля модели Phrase, которые читают обработчики."""
+    id: int
+    topic_id: int
+    level_id: int
+    text_en: str
+    text_ru: str
+    text_uz: str
+
+
+class PhraseStore:
+    """
+    Компактное хранилище таблицы phrases в памяти.
+
+    Данные лежат в массивах, индексированных по id фразы: topic_id/level_id
+    в array('i'), тексты — в списках интернированных строк. Фразы почти
+    не меняются, поэтому догружаем только новые строки после водяного знака
+    max(id), а не перечитываем всю таблицу.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._topic_ids = array('i')
+        self._level_ids = array('i')
+        self._text_en: list[str | None] = []
+        self._text_ru: list[str | None] = []
+        self._text_uz: list[str | None] = []
+        # (topic_id, level_id) -> массив id фраз, для выбора случайной фразы
+        self._groups: dict[tuple[int, int], array] = {}
+        self._watermark = 0
+        self._count = 0
+        self._refreshed_at = 0.0
+        self._last_loaded = 0
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _grow(self, max_id: int):
+        missing = max_id + 1 - len(self._topic_ids)
+        if missing <= 0:
+            return
+        self._topic_ids.extend([0] * missing)
+        self._level_ids.extend([0] * missing)
+        self._text_en.extend([None] * missing)
+        self._text_ru.extend([None] * missing)
+        self._text_uz.extend([None] * missing)
+
+    def _add_rows(self, rows):
+        self._grow(rows[-1].id)
+        for row in rows:
+            self._topic_ids[row.id] = row.topic_id
+            self._level_ids[row.id] = row.level_id
+            self._text_en[row.id] = sys.intern(row.text_en)
+            self._text_ru[row.id] = sys.intern(row.text_ru)
+            self._text_uz[row.id] = sys.intern(row.text_uz)
+            self._groups.setdefault((row.topic_id, row.level_id), array('i')).append(row.id)
+            self._count += 1
+        self._watermark = rows[-1].id
+
+    async def refresh(self, max_age: float = 0) -> int:
+        """
+        Догружает фразы с id больше водяного знака. Возвращает число новых фраз.
+        Если с прошлой догрузки прошло меньше max_age секунд, ничего не делает:
+        возраст проверяется под блокировкой, поэтому обработчики, которые ждали
+        ее одновременно, не повторяют запрос друг за другом.
+        """
+        async with self._lock:
+            if time.monotonic() - self._refreshed_at < max_age:
+                return 0
+            loaded = 0
+            async with async_session_factory() as session:
+                while True:
+                    rows = await crud.get_phrases_after(session, self._watermark, LOAD_BATCH_SIZE)
+                    if not rows:
+                        break
+                    self._add_rows(rows)
+                    loaded += len(rows)
+                    if len(rows) < LOAD_BATCH_SIZE:
+                        break
+            self._refreshed_at = time.monotonic()
+            self._last_loaded = loaded
+
+        if loaded:
+            usage = self.memory_usage()
+            logger.info(
+                f"Phrase store: +{loaded} phrases, total {self._count}, "
+                f"{usage['total_bytes'] / 2**20:.1f} MB "
+                f"(~{usage['bytes_per_million'] / 2**20:.0f} MB per million phrases)"
+            )
+        return loaded
+
+    async def _refresh_if_stale(self):
+        if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            await self.refresh(max_age=self.refresh_interval)
+
+    def _build(self, phrase_id: int) -> CachedPhrase | None:
+        if phrase_id <= 0 or phrase_id >= len(self._topic_ids) or not self._topic_ids[phrase_id]:
+            return None
+        return CachedPhrase(
+            id=phrase_id,
+            topic_id=self._topic_ids[phrase_id],
+            level_id=self._level_ids[phrase_id],
+            text_en=self._text_en[phrase_id],
+            text_ru=self._text_ru[phrase_id],
+            text_uz=self._text_uz[phrase_id],
+        )
+
+    async def get(self, phrase_id: int) -> CachedPhrase | None:
+        """Возвращает фразу по id. Если id новее водяного знака, сначала догружает таблицу."""
+        if phrase_id > self._watermark:
+            await self.refresh(max_age=0 if self._last_loaded else MISS_REFRESH_SECONDS)
+        return self._build(phrase_id)
+
+    async def get_random(self, topic_id: int, level_id: int) -> CachedPhrase | None:
+        """Случайная фраза для заданной темы и уровня."""
+        await self._refresh_if_stale()
+        ids = self._groups.get((topic_id, level_id))
+        if not ids:
+            return None
+        return self._build(random.choice(ids))
+
+    def memory_usage(self) -> dict:
+        """Оценка занимаемой памяти: массивы, списки и уникальные строки."""
+        containers = (
+            sys.getsizeof(self._topic_ids) + sys.getsizeof(self._level_ids)
+            + sys.getsizeof(self._text_en) + sys.getsizeof(self._text_ru)
+            + sys.getsizeof(self._text_uz)
+            + sum(sys.getsizeof(ids) for ids in self._groups.values())
+        )
+        unique_strings = {
+            id(text): text
+            for column in (self._text_en, self._text_ru, self._text_uz)
+            for text in column if text is not None
+        }
+        strings = sum(sys.getsizeof(text) for text in unique_strings.values())
+        total = containers + strings
+        per_million = total / self._count * 1_000_000 if self._count else 0
+        return {
+            'phrases': self._count,
+            'total_bytes': total,
+            'bytes_per_million': int(per_million),
+        }
+
+
+# Единственный экземпляр хранилища для всего приложения
+phrase_store = PhraseStore(refresh_interval=settings.PHRASE_STORE_REFRESH_SECONDS)
@@ -0,0 +1,235 @@
+# app/progress_archive.py
+
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import select, func, text
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.database import export_engine
+from app.leaderboard import prune_weekly_scores
+from app.models import add_months, partition_name
+
+logger = logging.getLogger(__name__)
+
+# На сколько месяцев вперед заранее создаем партиции user_progress
+PARTITIONS_AHEAD = 2
+# Как часто (в секундах) проверяем партиции и сворачиваем старые месяцы
+ARCHIVE_INTERVAL_SECONDS = 6 * 3600
+# Ключ advisory-блокировки Postgres: обслуживанием занимается только один процесс
+ARCHIVE_LOCK_KEY = 726002
+# Сколько DDL ждет блокировку, прежде чем отступить до следующего прохода.
+# Пока запрос блокировки стоит в очереди, за ним ждут и обычные запросы к таблице.
+LOCK_TIMEOUT = '2s'
+
+PARTITION_NAME_RE = re.compile(r"^user_progress_y(\d{4})m(\d{2})$")
+# Postgres: lock_not_available (сработал lock_timeout)
+LOCK_NOT_AVAILABLE = '55P03'
+
+_archive_task: asyncio.Task | None = None
+
+# Сворачивает попытки из source в строки (пользователь, фраза, месяц).
+# Если строки месяца уже есть в свертке, суммы складываются.
+ROLLUP_SQL = """
+INSERT INTO user_progress_rollup AS r
+    (user_id, phrase_id, month, attempts, score_sum, min_score, max_score, last_score, last_attempt)
+SELECT user_id, phrase_id, date_trunc('month', last_attempt)::date,
+       sum(attempts), sum(coalesce(score, 0)), min(score), max(score),
+       (array_agg(score ORDER BY last_attempt DESC))[1], max(last_attempt)
+FROM {source}
+WHERE last_attempt < :cutoff
+GROUP BY user_id, phrase_id, date_trunc('month', last_attempt)::date
+ON CONFLICT (user_id, phrase_id, month) DO UPDATE SET
+    attempts = r.attempts + excluded.attempts,
+    score_sum = r.score_sum + excluded.score_sum,
+    min_score = least(r.min_score, excluded.min_score),
+    max_score = greatest(r.max_score, excluded.max_score),
+    last_score = CASE WHEN excluded.last_attempt >= r.last_attempt
+                      THEN excluded.last_score ELSE r.last_score END,
+    last_attempt = greatest(r.last_attempt, excluded.last_attempt)
+"""
+
+
+def is_lock_timeout(error: OperationalError) -> bool:
+    return getattr(error.orig, 'sqlstate', None) == LOCK_NOT_AVAILABLE
+
+
+async def is_partitioned(conn) -> bool:
+    """
+    False, если user_progress осталась обычной таблицей (например, не прошло
+    преобразование в apply_schema_upgrades). Тогда обслуживать нечего.
+    """
+    relkind = await conn.scalar(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass('user_progress')"
+    ))
+    await conn.commit()
+    if relkind != 'p':
+        logger.error("user_progress is not partitioned, partition maintenance is skipped")
+        return False
+    return True
+
+
+async def ensure_partitions(conn, today: date) -> bool:
+    """
+    Создает партиции на текущий и следующие PARTITIONS_AHEAD месяцев.
+    Таблица создается отдельно и подключается через ATTACH: он берет на user_progress
+    только SHARE UPDATE EXCLUSIVE (чтение и запись продолжаются), но создание
+    унаследованных внешних ключей берет SHARE ROW EXCLUSIVE на users и phrases,
+    и запись в них ждет до коммита. Поэтому ожидание блокировок ограничено
+    LOCK_TIMEOUT: если их не дали, остальное откладывается до следующего прохода
+    (партиции создаются с запасом). Возвращает False, если что-то отложено.
+    """
+    current = today.replace(day=1)
+    for offset in range(PARTITIONS_AHEAD + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        exists = await conn.scalar(select(func.to_regclass(name)))
+        await conn.commit()
+        if exists:
+            continue
+
+        try:
+            async with conn.begin():
+                await conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+                await conn.execute(text(
+                    f"CREATE TABLE {name} (LIKE user_progress INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                ))
+                await conn.execute(text(
+                    f"ALTER TABLE user_progress ATTACH PARTITION {name} "
+                    f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+                ))
+        except OperationalError as e:
+            if not is_lock_timeout(e):
+                raise
+            logger.warning(f"Lock timeout while creating partition {name}, will retry later")
+            return False
+        logger.info(f"Created partition {name}")
+    return True
+
+
+async def compact(conn, cutoff: date) -> int:
+    """
+    Сворачивает месяцы старше cutoff в user_progress_rollup и удаляет их партиции.
+    Свертка, DETACH и DROP идут в одной транзакции, поэтому progress_history()
+    всегда видит месяц: либо сырыми строками, либо свернутым.
+    Блокировки берутся после свертки и держатся только до коммита: DETACH берет
+    ACCESS EXCLUSIVE на user_progress, DROP (из-за внешних ключей) — SHARE ROW EXCLUSIVE
+    на users и phrases. Если их не дали за LOCK_TIMEOUT, транзакция откатывается,
+    и оставшиеся месяцы остаются сырыми до следующего прохода.
+    Возвращает число удаленных партиций.
+    """
+    result = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'user_progress'::regclass"
+    ))
+    names = [row.relname for row in result]
+    await conn.commit()
+
+    dropped = 0
+    for name in sorted(names):
+        match = PARTITION_NAME_RE.match(name)
+        if not match or date(int(match[1]), int(match[2]), 1) >= cutoff:
+            continue
+        try:
+            async with conn.begin():
+                await conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+                await conn.execute(text(ROLLUP_SQL.format(source=name)), {'cutoff': cutoff})
+                await conn.execute(text(f"ALTER TABLE user_progress DETACH PARTITION {name}"))
+                await conn.execute(text(f"DROP TABLE {name}"))
+        except OperationalError as e:
+            if not is_lock_timeout(e):
+                raise
+            # Каждая попытка держит очередь запросов к таблице до LOCK_TIMEOUT,
+            # поэтому остальные месяцы тоже откладываем до следующего прохода
+            logger.warning(f"Lock timeout while rolling up {name}, will retry later")
+            break
+        dropped += 1
+        logger.info(f"Rolled up and dropped partition {name}")
+    return dropped
+
+
+async def maintain_progress():
+    """Один проход обслуживания: партиции вперед и свертка старых месяцев."""
+    today = datetime.now(timezone.utc).date()
+    cutoff = add_months(today.replace(day=1), -settings.PROGRESS_RAW_MONTHS)
+
+    # Отдельное соединение без пула: обслуживание не занимает соединения бота
+    async with export_engine.connect() as conn:
+        locked = await conn.scalar(select(func.pg_try_advisory_lock(ARCHIVE_LOCK_KEY)))
+        await conn.commit()
+        if not locked:
+            return
+        try:
+            if not await is_partitioned(conn):
+                return
+            await ensure_partitions(conn, today)
+            await compact(conn, cutoff)
+        finally:
+            await conn.rollback()
+            await conn.scalar(select(func.pg_advisory_unlock(ARCHIVE_LOCK_KEY)))
+            await conn.commit()
+
+
+async def prepare_partitions():
+    """
+    Перед запуском бота: без партиции текущего месяца вставка попыток не пройдет
+    (партиции по умолчанию нет). Обычно она уже создана заранее, и это одна проверка.
+    """
+    today = datetime.now(timezone.utc).date()
+    async with export_engine.connect() as conn:
+        if not await is_partitioned(conn):
+            return
+        exists = await conn.scalar(select(func.to_regclass(partition_name(today.replace(day=1)))))
+        await conn.commit()
+        if exists:
+            return
+        # Новая база: ждем, если партиции прямо сейчас создает другой процесс
+        await conn.scalar(select(func.pg_advisory_lock(ARCHIVE_LOCK_KEY)))
+        await conn.commit()
+        try:
+            await ensure_partitions(conn, today)
+        finally:
+            await conn.rollback()
+            await conn.scalar(select(func.pg_advisory_unlock(ARCHIVE_LOCK_KEY)))
+            await conn.commit()
+
+
+async def archive_loop():
+    while True:
+        try:
+            await maintain_progress()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error while maintaining user_progress partitions: {e}", exc_info=True)
+        # Отдельный шаг: ошибка обслуживания партиций не должна отменять очистку рейтингов
+        try:
+            await prune_weekly_scores()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error while pruning weekly leaderboards: {e}", exc_info=True)
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+
+async def start_progress_archive():
+    """Создает недостающие партиции и запускает фоновое обслуживание user_progress."""
+    global _archive_task
+    await prepare_partitions()
+    if _archive_task is None:
+        _archive_task = asyncio.create_task(archive_loop())
+
+
+async def stop_progress_archive():
+    global _archive_task
+    if _archive_task is None:
+        return
+    _archive_task.cancel()
+    try:
+        await _archive_task
+    except asyncio.CancelledError:
+        pass
+    _archive_task = None
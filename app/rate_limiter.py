@@ -0,0 +1,108 @@
+# app/rate_limiter.py
+
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# rate_limit_args для фоновых рассылок: они уступают очередь ответам пользователям
+LOW_PRIORITY = 'low'
+# Сколько раз повторяем запрос после RetryAfter, прежде чем вернуть ошибку
+MAX_RETRIES = 2
+
+
+class RateLimiter:
+    """
+    Равномерно распределяет отправки: не чаще одной за interval секунд.
+    Слот резервируется до ожидания, поэтому limiter можно ждать из нескольких задач сразу.
+    """
+
+    def __init__(self, per_second: float):
+        self.interval = 1 / per_second
+        self._next_at = 0.0
+        self._paused_until = 0.0
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            slot = max(now, self._next_at)
+            self._next_at = slot + self.interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            # Если пока мы ждали, началась пауза, занимаем новый слот после нее
+            if loop.time() >= self._paused_until:
+                return
+
+    def pause(self, seconds: float):
+        """Приостанавливает все отправки как минимум на seconds секунд."""
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+        self._next_at = max(self._next_at, self._paused_until)
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if isinstance(retry_after, timedelta) else retry_after
+
+
+class SharedRateLimiter(BaseRateLimiter[str]):
+    """
+    Общий лимит для всех сообщений бота в этом процессе: ответы пользователям
+    и рассылки вместе не чаще max_per_second (лимит Telegram ~30 сообщений/с).
+
+    Рассылки (rate_limit_args=LOW_PRIORITY) дополнительно ограничены low_per_second
+    и пропускают вперед ответы, которые ждут своей очереди, поэтому ответам всегда
+    остается не меньше max_per_second - low_per_second сообщений в секунду.
+    После RetryAfter пауза действует на все отправки, а запрос повторяется.
+    """
+
+    def __init__(self, max_per_second: float, low_per_second: float):
+        if low_per_second >= max_per_second:
+            raise ValueError("low_per_second must be below max_per_second to leave room for replies")
+        self._overall = RateLimiter(max_per_second)
+        self._low = RateLimiter(low_per_second)
+        self._waiting_replies = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def _acquire(self, low_priority: bool):
+        if not low_priority:
+            self._waiting_replies += 1
+            try:
+                await self._overall.wait()
+            finally:
+                self._waiting_replies -= 1
+            return
+
+        await self._low.wait()
+        while self._waiting_replies:
+            await asyncio.sleep(self._overall.interval)
+        await self._overall.wait()
+
+    async def process_request(self, callback, args: Any, kwargs: dict[str, Any], endpoint: str,
+                              data: dict[str, Any], rate_limit_args: str | None):
+        # Как и AIORateLimiter, ограничиваем только запросы, адресованные чату
+        limited = bool(data.get('chat_id'))
+        for attempt in range(MAX_RETRIES + 1):
+            if limited:
+                await self._acquire(rate_limit_args == LOW_PRIORITY)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                seconds = retry_after_seconds(e)
+                logger.warning(f"Flood control on {endpoint}, pausing all sends for {seconds}s")
+                self._overall.pause(seconds)
+                if not limited:
+                    await asyncio.sleep(seconds)
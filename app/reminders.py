@@ -0,0 +1,183 @@
+# app/reminders.py
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, func
+from telegram.error import Forbidden, TelegramError
+from telegram.ext import ExtBot
+
+from app import crud
+from app.core.config import settings
+from app.database import async_session_factory, export_engine
+from app.rate_limiter import LOW_PRIORITY, RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Фразы с оценкой ниже этого порога считаем "на повторение"
+DUE_SCORE_THRESHOLD = 70
+# Как часто сохраняем прогресс рассылки (в отправленных сообщениях)
+CHECKPOINT_EVERY = 20
+# Ключ advisory-блокировки Postgres: рассылку ведет только один процесс
+REMINDER_LOCK_KEY = 726001
+
+# Результаты отправки одного напоминания
+SEND_OK = 'sent'
+SEND_BLOCKED = 'blocked'
+SEND_FAILED = 'failed'
+
+_reminder_task: asyncio.Task | None = None
+
+reminder_texts = {
+    'ru': "⏰ Пора потренироваться! Нажмите «▶ Начать тренировку».",
+    'en': "⏰ Time to practice! Tap “▶ Start Training”.",
+    'uz': "⏰ Mashq qilish vaqti! «▶ Mashg‘ulotni boshlash» tugmasini bosing.",
+}
+due_texts = {
+    'ru': "\n\n🔁 Фраз на повторение: {count}",
+    'en': "\n\n🔁 Phrases to review: {count}",
+    'uz': "\n\n🔁 Takrorlash uchun iboralar: {count}",
+}
+
+
+def build_reminder_text(language: str | None, due_phrases: int) -> str:
+    text = reminder_texts.get(language, reminder_texts['ru'])
+    if due_phrases:
+        text += due_texts.get(language, due_texts['ru']).format(count=due_phrases)
+    return text
+
+
+async def _send(bot: ExtBot, tg_id: int, text: str) -> str:
+    """
+    Отправляет напоминание. Возвращает SEND_OK, SEND_BLOCKED или SEND_FAILED.
+    Запрос идет через общий SharedRateLimiter бота с низким приоритетом
+    (он же повторяет запрос после RetryAfter).
+    """
+    try:
+        await bot.send_message(chat_id=tg_id, text=text, rate_limit_args=LOW_PRIORITY)
+        return SEND_OK
+    except Forbidden:
+        return SEND_BLOCKED
+    except TelegramError as e:
+        logger.warning(f"Failed to send reminder to {tg_id}: {e}")
+        return SEND_FAILED
+
+
+async def send_daily_reminders(bot: ExtBot, window_end: datetime):
+    """
+    Рассылает напоминания за сегодняшний день.
+
+    Пользователи выбираются пачками по keyset-пагинации (users.id > last_user_id),
+    прогресс сохраняется в reminder_checkpoints, поэтому после рестарта рассылка
+    продолжается с места остановки. Отправка растягивается до window_end и
+    не превышает REMINDER_MAX_PER_SECOND.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    run_date = now.date()
+    # С часовым поясом: last_attempt хранится во времени сессии БД (now()),
+    # и Postgres сам переведет начало UTC-суток в это время
+    day_start = datetime.combine(run_date, datetime.min.time(), tzinfo=timezone.utc)
+
+    async with async_session_factory() as session:
+        checkpoint = await crud.get_reminder_checkpoint(session, run_date)
+        if checkpoint.finished_at:
+            return
+        last_user_id, sent = checkpoint.last_user_id, checkpoint.sent
+        remaining = await crud.count_reminder_users(session, last_user_id)
+
+    seconds_left = max((window_end - now).total_seconds(), 1)
+    per_second = min(settings.REMINDER_MAX_PER_SECOND, max(remaining / seconds_left, 1))
+    limiter = RateLimiter(per_second)
+    logger.info(f"Reminders for {run_date}: {remaining} users left, {per_second:.1f} msg/s")
+
+    while True:
+        async with async_session_factory() as session:
+            batch = await crud.get_reminder_users_batch(
+                session, last_user_id, settings.REMINDER_BATCH_SIZE, day_start, DUE_SCORE_THRESHOLD
+            )
+        if not batch:
+            break
+
+        blocked = []
+        since_checkpoint = 0
+        for row in batch:
+            last_user_id = row.id
+            if row.practiced:
+                continue
+            await limiter.wait()
+            status = await _send(bot, row.tg_id, build_reminder_text(row.language, row.due_phrases))
+            if status == SEND_OK:
+                sent += 1
+            elif status == SEND_BLOCKED:
+                blocked.append(row.id)
+            # Неудачные попытки тоже продвигают курсор, поэтому учитываем их в частоте сохранения
+            since_checkpoint += 1
+            if since_checkpoint >= CHECKPOINT_EVERY:
+                async with async_session_factory() as session:
+                    await crud.save_reminder_checkpoint(session, run_date, last_user_id, sent)
+                since_checkpoint = 0
+
+        async with async_session_factory() as session:
+            await crud.disable_reminders(session, blocked)
+            await crud.save_reminder_checkpoint(session, run_date, last_user_id, sent)
+
+    async with async_session_factory() as session:
+        await crud.save_reminder_checkpoint(session, run_date, last_user_id, sent, finished=True)
+    logger.info(f"Reminders for {run_date} finished: {sent} sent")
+
+
+async def reminder_loop(bot: ExtBot):
+    """Фоновая задача: каждый день в REMINDER_HOUR_UTC запускает рассылку."""
+    window = timedelta(minutes=settings.REMINDER_WINDOW_MINUTES)
+    while True:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        start = now.replace(hour=settings.REMINDER_HOUR_UTC, minute=0, second=0, microsecond=0)
+        if now < start:
+            await asyncio.sleep((start - now).total_seconds())
+            continue
+
+        if now < start + window:
+            try:
+                # При нескольких процессах рассылку ведет тот, кто взял блокировку.
+                # Блокировка сессионная: держим ее на отдельном соединении без пула
+                # и сразу фиксируем транзакцию, чтобы соединение не висело
+                # "idle in transaction" всю рассылку.
+                async with export_engine.connect() as conn:
+                    locked = await conn.scalar(select(func.pg_try_advisory_lock(REMINDER_LOCK_KEY)))
+                    await conn.commit()
+                    if locked:
+                        try:
+                            await send_daily_reminders(bot, start + window)
+                        finally:
+                            await conn.scalar(select(func.pg_advisory_unlock(REMINDER_LOCK_KEY)))
+                            await conn.commit()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error while sending reminders: {e}", exc_info=True)
+                # Прогресс сохранен в checkpoint, пробуем продолжить через минуту
+                await asyncio.sleep(60)
+                continue
+
+        tomorrow = start + timedelta(days=1)
+        await asyncio.sleep((tomorrow - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds())
+
+
+def start_reminders(bot: ExtBot):
+    """Запускает фоновую рассылку, если она включена в настройках."""
+    global _reminder_task
+    if settings.REMINDERS_ENABLED and _reminder_task is None:
+        _reminder_task = asyncio.create_task(reminder_loop(bot))
+
+
+async def stop_reminders():
+    global _reminder_task
+    if _reminder_task is None:
+        return
+    _reminder_task.cancel()
+    try:
+        await _reminder_task
+    except asyncio.CancelledError:
+        pass
+    _reminder_task = None
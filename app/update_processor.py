@@ -0,0 +1,68 @@
+# app/update_processor.py
+
+import asyncio
+import sys
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обрабатывает апдейты параллельно, но строго по порядку внутри одного чата.
+
+    Апдейты разных пользователей не ждут друг друга (например, долгий ответ
+    Gemini одному пользователю не блокирует кнопки у остальных). Апдейты одного
+    чата проходят через собственный asyncio.Lock, который отдает управление
+    ожидающим в порядке очереди (FIFO).
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        # Базовый семафор берется до do_process_update, то есть до блокировки чата.
+        # Если ограничивать им, несколько апдейтов одного чата заняли бы слоты,
+        # просто ожидая свою очередь. Поэтому базовому классу передаем sys.maxsize
+        # (и не переопределяем max_concurrent_updates, из которого он строит семафор),
+        # а лимит применяем сами, уже после получения блокировки чата.
+        super().__init__(sys.maxsize)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # chat_id -> (блокировка, число апдейтов чата в работе или в очереди)
+        self._chat_locks: dict[int, tuple[asyncio.Lock, int]] = {}
+
+    @staticmethod
+    def _key(update: object) -> int | None:
+        if isinstance(update, Update):
+            if update.effective_chat:
+                return update.effective_chat.id
+            if update.effective_user:
+                return update.effective_user.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self._key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        lock, pending = self._chat_locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._chat_locks[key] = (lock, pending + 1)
+        try:
+            async with lock:
+                async with self._slots:
+                    await coroutine
+        finally:
+            # Удаляем блокировку, когда у чата не осталось апдейтов в очереди
+            lock, pending = self._chat_locks[key]
+            if pending == 1:
+                del self._chat_locks[key]
+            else:
+                self._chat_locks[key] = (lock, pending - 1)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass